@@ -1,28 +1,141 @@
+import asyncio
 import os
+import queue
 import sqlite3
-from contextlib import contextmanager
-from typing import Generator
+import threading
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncGenerator, Generator, Optional
+
+import aiosqlite
 
 DATABASE_PATH = os.getenv("DATABASE_PATH", "app.db")
+READER_POOL_SIZE = int(os.getenv("DATABASE_READER_POOL_SIZE", "4"))
+READER_POOL_TIMEOUT = float(os.getenv("DATABASE_READER_POOL_TIMEOUT", "5"))
+STATEMENT_CACHE_SIZE = 256
+
+_pool_lock = threading.Lock()
+_readers: Optional["queue.Queue[sqlite3.Connection]"] = None
+# The writer lock and connection belong to the event loop that created them
+_async_writer_loop: Optional[asyncio.AbstractEventLoop] = None
+_async_writer_lock: Optional[asyncio.Lock] = None
+_async_writer: Optional[aiosqlite.Connection] = None
+
+PRAGMAS = [
+    "PRAGMA foreign_keys = ON",  # Enable foreign key support
+    "PRAGMA journal_mode = WAL",  # Let readers run alongside the writer
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -64000",  # ~64MB page cache
+]
 
 
 def get_connection() -> sqlite3.Connection:
     """Create a new database connection."""
-    conn = sqlite3.connect(DATABASE_PATH)
+    conn = sqlite3.connect(DATABASE_PATH, check_same_thread=False, cached_statements=STATEMENT_CACHE_SIZE)
     conn.row_factory = sqlite3.Row  # Enable dict-like access to rows
-    conn.execute("PRAGMA foreign_keys = ON")  # Enable foreign key support
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+
+async def get_async_connection() -> aiosqlite.Connection:
+    """Create a new asyncio database connection."""
+    conn = await aiosqlite.connect(DATABASE_PATH, cached_statements=STATEMENT_CACHE_SIZE)
+    conn.row_factory = sqlite3.Row
+    for pragma in PRAGMAS:
+        await conn.execute(pragma)
     return conn
 
 
+def _init_pool() -> "queue.Queue[sqlite3.Connection]":
+    """Open the reader connections on first use and return the pool."""
+    global _readers
+    with _pool_lock:
+        if _readers is None:
+            readers = queue.Queue()
+            for _ in range(READER_POOL_SIZE):
+                readers.put(get_connection())
+            _readers = readers
+        return _readers
+
+
+def close_pool() -> None:
+    """Close all pooled reader connections."""
+    global _readers
+    with _pool_lock:
+        if _readers is not None:
+            while not _readers.empty():
+                _readers.get_nowait().close()
+        _readers = None
+
+
 @contextmanager
 def get_db() -> Generator[sqlite3.Connection, None, None]:
-    """Context manager for database connections."""
-    conn = get_connection()
+    """
+    Context manager for a pooled read-only database connection.
+    All writes go through get_async_db(), the app's single writer connection.
+    """
+    readers = _readers or _init_pool()
+    try:
+        conn = readers.get(timeout=READER_POOL_TIMEOUT)
+    except queue.Empty:
+        raise RuntimeError(
+            f"Timed out after {READER_POOL_TIMEOUT}s waiting for one of {READER_POOL_SIZE} reader connections"
+        ) from None
+
     try:
         yield conn
-        conn.commit()
-    except Exception:
-        conn.rollback()
-        raise
     finally:
-        conn.close()
+        conn.rollback()
+        with _pool_lock:
+            # Return the connection unless close_pool() retired this pool meanwhile
+            if readers is _readers:
+                readers.put(conn)
+            else:
+                conn.close()
+
+
+def _get_async_writer_lock() -> asyncio.Lock:
+    """Return the writer lock for the running event loop, creating it on first use."""
+    global _async_writer_loop, _async_writer_lock, _async_writer
+    loop = asyncio.get_running_loop()
+    if _async_writer_loop is not loop:
+        # A connection opened on another loop cannot be used (or awaited) here
+        _async_writer_loop = loop
+        _async_writer_lock = asyncio.Lock()
+        _async_writer = None
+    return _async_writer_lock
+
+
+async def close_async_db() -> None:
+    """Close the asyncio writer connection and forget its event loop."""
+    global _async_writer_loop, _async_writer_lock, _async_writer
+    async with _get_async_writer_lock():
+        if _async_writer is not None:
+            await _async_writer.close()
+        _async_writer = None
+    _async_writer_loop = None
+    _async_writer_lock = None
+
+
+@asynccontextmanager
+async def get_async_db() -> AsyncGenerator[aiosqlite.Connection, None]:
+    """
+    Async context manager for the app's single writer connection.
+    Every write is serialized on it; waiting writers queue on an asyncio.Lock
+    instead of holding a threadpool worker.
+    """
+    global _async_writer
+    async with _get_async_writer_lock():
+        if _async_writer is None:
+            _async_writer = await get_async_connection()
+        conn = _async_writer
+        try:
+            yield conn
+            await conn.commit()
+        except BaseException:
+            # Also roll back on cancellation so no half-finished transaction is
+            # left open for the next writer to commit. The shield lets the
+            # rollback finish even if this task is cancelled again meanwhile.
+            await asyncio.shield(conn.rollback())
+            raise
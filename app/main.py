@@ -1,8 +1,28 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 
+from app.database import close_async_db, close_pool, get_db
 from app.routes import health_router, items_router, invoices
 
-app = FastAPI(title="Backend Exercise API", version="1.0.0")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm the products cache so invoice creation doesn't query products
+    with get_db() as conn:
+        invoices.load_products_cache(conn)
+    yield
+    await close_async_db()
+    close_pool()
+
+
+app = FastAPI(
+    title="Backend Exercise API",
+    version="1.0.0",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan,
+)
 
 # Register routers
 app.include_router(health_router)
@@ -1,11 +1,57 @@
+import sqlite3
+import threading
+import msgspec
+from cachetools import TTLCache
 from fastapi import APIRouter, HTTPException, status
+from fastapi.responses import ORJSONResponse, Response
 from pydantic import BaseModel
 from typing import List, Optional
 from datetime import date
-from app.database import get_db
+from app.database import get_async_db, get_db
 
 router = APIRouter(prefix="/invoices", tags=["invoices"])
 
+# --- SQL ---
+
+# All invoice SQL lives here in one place. Prepared statements are reused through each
+# connection's statement cache (keyed by SQL text), enlarged via cached_statements in
+# app.database.
+
+SQL_GET_CLIENT = "SELECT id, name FROM clients WHERE id = ?"
+
+SQL_GET_PRODUCTS = "SELECT id, name, price FROM products"
+
+SQL_GET_PRODUCTS_BY_ID = "SELECT id, name, price FROM products WHERE id IN ({placeholders})"
+
+SQL_INVOICE_NO_EXISTS = "SELECT 1 FROM invoices WHERE invoice_no = ?"
+
+SQL_INSERT_INVOICE = """
+    INSERT INTO invoices (invoice_no, issue_date, due_date, client_id, tax_amount, total_amount)
+    VALUES (?, ?, ?, ?, ?, ?)
+"""
+
+SQL_INSERT_ITEMS = """
+    INSERT INTO invoice_items (invoice_id, product_id, quantity, unit_price, line_total)
+    VALUES {values}
+    RETURNING id
+"""
+
+SQL_LIST = """
+    SELECT id, invoice_no, issue_date, due_date, total_amount, client_name
+    FROM v_invoice_list
+    ORDER BY id DESC
+"""
+
+SQL_GET = """
+    SELECT id, invoice_no, issue_date, due_date, tax_amount, total_amount, client_name,
+           item_id, product_name, quantity, unit_price, line_total
+    FROM v_invoice_detail
+    WHERE id = ?
+    ORDER BY item_id
+"""
+
+SQL_DELETE = "DELETE FROM invoices WHERE id = ?"
+
 # --- Pydantic Models ---
 
 class InvoiceItemCreate(BaseModel):
@@ -44,90 +90,181 @@ class InvoiceListResponse(BaseModel):
     client_name: str
     total_amount: float
 
+# --- msgspec Structs ---
+
+class InvoiceListStruct(msgspec.Struct):
+    """Wire format for InvoiceListResponse; fields follow SQL_LIST column order."""
+    id: int
+    invoice_no: str
+    issue_date: str
+    due_date: str
+    total_amount: float
+    client_name: str
+
+_json_encoder = msgspec.json.Encoder()
+
+# --- Products Cache ---
+
+def to_cents(amount: float) -> int:
+    """Convert a currency amount to integer cents."""
+    return int(round(amount * 100))
+
+
+# Products are seed data and read-mostly, so keep {id: (name, price_cents)} in memory.
+_PRODUCTS_CACHE = {}
+_PRODUCTS_CACHE_LOCK = threading.RLock()
+_PRODUCTS_CACHE_VERSION = 0
+
+
+def load_products_cache(conn):
+    """Populate the products cache from the database."""
+    rows = conn.execute(SQL_GET_PRODUCTS).fetchall()
+    with _PRODUCTS_CACHE_LOCK:
+        _PRODUCTS_CACHE.clear()
+        _PRODUCTS_CACHE.update({row["id"]: (row["name"], to_cents(row["price"])) for row in rows})
+
+
+def invalidate_products_cache():
+    """Drop cached products. Call after any product mutation."""
+    global _PRODUCTS_CACHE_VERSION
+    with _PRODUCTS_CACHE_LOCK:
+        _PRODUCTS_CACHE.clear()
+        _PRODUCTS_CACHE_VERSION += 1
+
+
+async def get_products(product_ids, conn):
+    """Return {id: (name, price_cents)} for the given IDs, loading cache misses from the database."""
+    with _PRODUCTS_CACHE_LOCK:
+        products = {pid: _PRODUCTS_CACHE[pid] for pid in product_ids if pid in _PRODUCTS_CACHE}
+        version = _PRODUCTS_CACHE_VERSION
+
+    missing = [pid for pid in product_ids if pid not in products]
+    if missing:
+        placeholders = ", ".join("?" * len(missing))
+        rows = await conn.execute_fetchall(SQL_GET_PRODUCTS_BY_ID.format(placeholders=placeholders), missing)
+        fetched = {row["id"]: (row["name"], to_cents(row["price"])) for row in rows}
+        products.update(fetched)
+        with _PRODUCTS_CACHE_LOCK:
+            # Skip the refresh if products were invalidated while we were reading
+            if version == _PRODUCTS_CACHE_VERSION:
+                _PRODUCTS_CACHE.update(fetched)
+
+    return products
+
+# --- Invoice List Cache ---
+
+# Encoded list_invoices payload, kept briefly so repeated polling skips the database.
+# Writers call invalidate_invoice_list_cache() after committing.
+_LIST_CACHE = TTLCache(maxsize=1, ttl=5)
+_LIST_CACHE_LOCK = threading.Lock()
+_LIST_CACHE_VERSION = 0
+
+
+def invalidate_invoice_list_cache():
+    """Drop the cached invoice list. Call after any committed invoice mutation."""
+    global _LIST_CACHE_VERSION
+    with _LIST_CACHE_LOCK:
+        _LIST_CACHE.clear()
+        _LIST_CACHE_VERSION += 1
+
 # --- Helper Functions ---
 
-def calculate_invoice_totals(items: List[InvoiceItemCreate], conn):
+TAX_RATE_PERCENT = 10
+
+async def calculate_invoice_totals(items: List[InvoiceItemCreate], conn):
     """Calculates total and tax based on products."""
-    total_amount = 0.0
+    subtotal_cents = 0
     processed_items = []
-    
+
+    products = await get_products({item.product_id for item in items}, conn)
+
+    # Money is summed in integer cents so totals don't pick up float drift
     for item in items:
-        cursor = conn.cursor()
-        cursor.execute("SELECT id, name, price FROM products WHERE id = ?", (item.product_id,))
-        product = cursor.fetchone()
-        
+        product = products.get(item.product_id)
+
         if not product:
             raise HTTPException(status_code=404, detail=f"Product with ID {item.product_id} not found")
             
-        line_total = product["price"] * item.quantity
-        total_amount += line_total
+        product_name, price_cents = product
+        line_cents = price_cents * item.quantity
+        subtotal_cents += line_cents
         processed_items.append({
-            "product_id": product["id"],
-            "product_name": product["name"],
-            "unit_price": product["price"],
+            "product_id": item.product_id,
+            "product_name": product_name,
+            "unit_price": price_cents / 100,
             "quantity": item.quantity,
-            "line_total": line_total
+            "line_total": line_cents / 100
         })
         
     # Simple tax calculation (e.g., 10% tax) - logic not specified in reqs, assuming flat or 0? 
     # Requirements say "tax" and "total". Let's assume a standard tax rate or just sum?
     # Requirement doesn't specify logic. I will add a 10% tax for demonstration.
-    tax_amount = total_amount * 0.10
-    final_total = total_amount + tax_amount
+    # Tax is rounded half up to the nearest cent.
+    tax_cents = (subtotal_cents * TAX_RATE_PERCENT + 50) // 100
+    final_cents = subtotal_cents + tax_cents
     
-    return processed_items, tax_amount, final_total
+    return processed_items, tax_cents / 100, final_cents / 100
 
 # --- Routes ---
 
 @router.post("", response_model=InvoiceResponse, status_code=status.HTTP_201_CREATED)
-def create_invoice(invoice: InvoiceCreate):
+async def create_invoice(invoice: InvoiceCreate):
     """Create a new invoice with items."""
     try:
-        with get_db() as conn:
-            cursor = conn.cursor()
+        async with get_async_db() as conn:
+            # Take the write lock up front so the transaction never has to upgrade
+            # mid-way and hit SQLITE_BUSY; get_async_db commits or rolls back on exit
+            await conn.execute("BEGIN IMMEDIATE")
             
             # Verify Client
-            cursor.execute("SELECT id, name FROM clients WHERE id = ?", (invoice.client_id,))
-            client = cursor.fetchone()
+            client = await (await conn.execute(SQL_GET_CLIENT, (invoice.client_id,))).fetchone()
             if not client:
                 raise HTTPException(status_code=404, detail="Client not found")
             
-            # Use transaction for atomicity (handled by get_db context manager commit/rollback)
-            
             # Calculate totals and validate products
-            processed_items, tax_amount, total_amount = calculate_invoice_totals(invoice.items, conn)
+            processed_items, tax_amount, total_amount = await calculate_invoice_totals(invoice.items, conn)
             
-            # Insert Invoice
+            # Reject duplicate invoice numbers before inserting
+            if await conn.execute_fetchall(SQL_INVOICE_NO_EXISTS, (invoice.invoice_no,)):
+                raise HTTPException(status_code=400, detail="Invoice number already exists")
+            
+            # Insert Invoice (the IntegrityError catch remains as a fallback)
             try:
-                cursor.execute("""
-                    INSERT INTO invoices (invoice_no, issue_date, due_date, client_id, tax_amount, total_amount)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                """, (invoice.invoice_no, invoice.issue_date, invoice.due_date, invoice.client_id, tax_amount, total_amount))
+                cursor = await conn.execute(
+                    SQL_INSERT_INVOICE,
+                    (invoice.invoice_no, invoice.issue_date, invoice.due_date, invoice.client_id, tax_amount, total_amount)
+                )
                 invoice_id = cursor.lastrowid
             except sqlite3.IntegrityError:
                 raise HTTPException(status_code=400, detail="Invoice number already exists")
 
-            # Insert Invoice Items
-            for item in processed_items:
-                cursor.execute("""
-                    INSERT INTO invoice_items (invoice_id, product_id, quantity, unit_price, line_total)
-                    VALUES (?, ?, ?, ?, ?)
-                """, (invoice_id, item["product_id"], item["quantity"], item["unit_price"], item["line_total"]))
+            # Insert Invoice Items in one statement and read back their generated IDs
+            item_ids = []
+            if processed_items:
+                values_sql = ", ".join(["(?, ?, ?, ?, ?)"] * len(processed_items))
+                params = [
+                    value
+                    for item in processed_items
+                    for value in (invoice_id, item["product_id"], item["quantity"], item["unit_price"], item["line_total"])
+                ]
+                rows = await conn.execute_fetchall(SQL_INSERT_ITEMS.format(values=values_sql), params)
+                # RETURNING order is unspecified, but AUTOINCREMENT IDs follow VALUES order
+                item_ids = sorted(row["id"] for row in rows)
             
-            # Construct Response
+            # Construct Response from values we just computed and wrote. model_construct()
+            # skips validation while building the models; FastAPI still validates the
+            # result once against response_model when serializing it.
             response_items = [
-                InvoiceItemResponse(
-                    id=0, # ID not available until read back, or we can fetch them. Let's just return what we have.
-                    # Actually valid response needs ID. For simplicity in this raw SQL approach without fetching back everything:
-                    # We will return the computed data. 
+                InvoiceItemResponse.model_construct(
+                    id=item_id,
                     product_name=item["product_name"],
                     quantity=item["quantity"],
                     unit_price=item["unit_price"],
                     line_total=item["line_total"]
-                ) for item in processed_items
+                ) for item_id, item in zip(item_ids, processed_items)
             ]
             
-            return InvoiceResponse(
+            response = InvoiceResponse.model_construct(
                 id=invoice_id,
                 invoice_no=invoice.invoice_no,
                 issue_date=invoice.issue_date,
@@ -138,85 +275,68 @@ def create_invoice(invoice: InvoiceCreate):
                 items=response_items
             )
             
+        invalidate_invoice_list_cache()
+        return response
+            
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
-@router.get("", response_model=List[InvoiceListResponse])
+@router.get("", responses={200: {"model": List[InvoiceListResponse]}})
 def list_invoices():
     """List all invoices."""
     try:
-        with get_db() as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT i.id, i.invoice_no, i.issue_date, i.due_date, i.total_amount, c.name as client_name
-                FROM invoices i
-                JOIN clients c ON i.client_id = c.id
-                ORDER BY i.id DESC
-            """)
-            rows = cursor.fetchall()
-            return [
-                InvoiceListResponse(
-                    id=row["id"],
-                    invoice_no=row["invoice_no"],
-                    issue_date=row["issue_date"], # sqlite driver might return str, pydantic handles it if format is standard ISO
-                    due_date=row["due_date"],
-                    client_name=row["client_name"],
-                    total_amount=row["total_amount"]
-                ) for row in rows
-            ]
+        with _LIST_CACHE_LOCK:
+            content = _LIST_CACHE.get("all")
+            version = _LIST_CACHE_VERSION
+
+        if content is None:
+            with get_db() as conn:
+                rows = conn.execute(SQL_LIST).fetchall()
+            content = _json_encoder.encode([InvoiceListStruct(*row) for row in rows])
+            with _LIST_CACHE_LOCK:
+                # Skip caching if an invoice was written while we were reading
+                if version == _LIST_CACHE_VERSION:
+                    _LIST_CACHE["all"] = content
+
+        return Response(content=content, media_type="application/json")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
-@router.get("/{invoice_id}", response_model=InvoiceResponse)
+@router.get("/{invoice_id}", response_class=ORJSONResponse, responses={200: {"model": InvoiceResponse}})
 def get_invoice(invoice_id: int):
     """Get a single invoice by ID."""
     try:
         with get_db() as conn:
-            cursor = conn.cursor()
-            
-            # Get Invoice Details
-            cursor.execute("""
-                SELECT i.id, i.invoice_no, i.issue_date, i.due_date, i.tax_amount, i.total_amount, c.name as client_name
-                FROM invoices i
-                JOIN clients c ON i.client_id = c.id
-                WHERE i.id = ?
-            """, (invoice_id,))
-            invoice = cursor.fetchone()
+            # Get Invoice Details and Items in one query
+            rows = conn.execute(SQL_GET, (invoice_id,)).fetchall()
             
-            if not invoice:
+            if not rows:
                 raise HTTPException(status_code=404, detail="Invoice not found")
                 
-            # Get Invoice Items
-            cursor.execute("""
-                SELECT ii.id, p.name as product_name, ii.quantity, ii.unit_price, ii.line_total
-                FROM invoice_items ii
-                JOIN products p ON ii.product_id = p.id
-                WHERE ii.invoice_id = ?
-            """, (invoice_id,))
-            items = cursor.fetchall()
-            
+            # Header columns repeat on every row; items are absent when the invoice has none
+            invoice = rows[0]
             response_items = [
-                InvoiceItemResponse(
-                    id=item["id"],
-                    product_name=item["product_name"],
-                    quantity=item["quantity"],
-                    unit_price=item["unit_price"],
-                    line_total=item["line_total"]
-                ) for item in items
+                {
+                    "id": row["item_id"],
+                    "product_name": row["product_name"],
+                    "quantity": row["quantity"],
+                    "unit_price": row["unit_price"],
+                    "line_total": row["line_total"]
+                } for row in rows if row["item_id"] is not None
             ]
             
-            return InvoiceResponse(
-                id=invoice["id"],
-                invoice_no=invoice["invoice_no"],
-                issue_date=invoice["issue_date"],
-                due_date=invoice["due_date"],
-                client_name=invoice["client_name"],
-                tax_amount=invoice["tax_amount"],
-                total_amount=invoice["total_amount"],
-                items=response_items
-            )
+            return ORJSONResponse(content={
+                "id": invoice["id"],
+                "invoice_no": invoice["invoice_no"],
+                "issue_date": invoice["issue_date"],
+                "due_date": invoice["due_date"],
+                "client_name": invoice["client_name"],
+                "tax_amount": invoice["tax_amount"],
+                "total_amount": invoice["total_amount"],
+                "items": response_items
+            })
             
     except HTTPException:
         raise
@@ -224,24 +344,17 @@ def get_invoice(invoice_id: int):
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
 @router.delete("/{invoice_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_invoice(invoice_id: int):
+async def delete_invoice(invoice_id: int):
     """Delete an invoice."""
     try:
-        with get_db() as conn:
-            cursor = conn.cursor()
-            
-            # Check if invoice exists
-            cursor.execute("SELECT id FROM invoices WHERE id = ?", (invoice_id,))
-            if not cursor.fetchone():
+        async with get_async_db() as conn:
+            # Invoice items are removed by ON DELETE CASCADE
+            cursor = await conn.execute(SQL_DELETE, (invoice_id,))
+            if cursor.rowcount == 0:
                 raise HTTPException(status_code=404, detail="Invoice not found")
             
-            # Delete items first (though cascade might handle it if configured, manual is safer for SQLite defaults sometimes)
-            cursor.execute("DELETE FROM invoice_items WHERE invoice_id = ?", (invoice_id,))
-            
-            # Delete invoice
-            cursor.execute("DELETE FROM invoices WHERE id = ?", (invoice_id,))
-            
-            return None
+        invalidate_invoice_list_cache()
+        return None
             
     except HTTPException:
         raise
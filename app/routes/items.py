@@ -1,7 +1,7 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 
-from app.database import get_db
+from app.database import get_async_db, get_db
 
 router = APIRouter(prefix="/items", tags=["items"])
 
@@ -57,15 +57,14 @@ def get_item(item_id: int):
 
 
 @router.post("", status_code=201)
-def create_item(item: ItemCreate):
+async def create_item(item: ItemCreate):
     """
     Create a new item.
     Uses raw SQL query (no ORM).
     """
     try:
-        with get_db() as conn:
-            cursor = conn.cursor()
-            cursor.execute("INSERT INTO items (name) VALUES (?)", (item.name,))
+        async with get_async_db() as conn:
+            cursor = await conn.execute("INSERT INTO items (name) VALUES (?)", (item.name,))
             item_id = cursor.lastrowid
             return {"id": item_id, "name": item.name}
     except Exception as e:
@@ -73,20 +72,19 @@ def create_item(item: ItemCreate):
 
 
 @router.put("/{item_id}")
-def update_item(item_id: int, item: ItemUpdate):
+async def update_item(item_id: int, item: ItemUpdate):
     """
     Update an existing item.
     Uses raw SQL query (no ORM).
     """
     try:
-        with get_db() as conn:
-            cursor = conn.cursor()
+        async with get_async_db() as conn:
             # Check if item exists
-            cursor.execute("SELECT id FROM items WHERE id = ?", (item_id,))
-            if cursor.fetchone() is None:
+            cursor = await conn.execute("SELECT id FROM items WHERE id = ?", (item_id,))
+            if await cursor.fetchone() is None:
                 raise HTTPException(status_code=404, detail="Item not found")
             # Update the item
-            cursor.execute("UPDATE items SET name = ? WHERE id = ?", (item.name, item_id))
+            await conn.execute("UPDATE items SET name = ? WHERE id = ?", (item.name, item_id))
             return {"id": item_id, "name": item.name}
     except HTTPException:
         raise
@@ -95,20 +93,19 @@ def update_item(item_id: int, item: ItemUpdate):
 
 
 @router.delete("/{item_id}", status_code=204)
-def delete_item(item_id: int):
+async def delete_item(item_id: int):
     """
     Delete an item.
     Uses raw SQL query (no ORM).
     """
     try:
-        with get_db() as conn:
-            cursor = conn.cursor()
+        async with get_async_db() as conn:
             # Check if item exists
-            cursor.execute("SELECT id FROM items WHERE id = ?", (item_id,))
-            if cursor.fetchone() is None:
+            cursor = await conn.execute("SELECT id FROM items WHERE id = ?", (item_id,))
+            if await cursor.fetchone() is None:
                 raise HTTPException(status_code=404, detail="Item not found")
             # Delete the item
-            cursor.execute("DELETE FROM items WHERE id = ?", (item_id,))
+            await conn.execute("DELETE FROM items WHERE id = ?", (item_id,))
             return None
     except HTTPException:
         raise
@@ -0,0 +1,165 @@
+"""
+Migration: Optimize invoicing schema
+Version: 003
+Description: Cascades invoice item deletes, adds indexes on invoicing foreign keys
+and creates views for the invoice list and detail queries.
+"""
+
+import sqlite3
+import sys
+import os
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import DATABASE_PATH
+
+
+def rebuild_invoice_items(cursor, on_delete):
+    """
+    Recreate invoice_items with the given ON DELETE clause on its invoice FK.
+    SQLite cannot alter a foreign key in place, so copy rows into a new table.
+    Must run inside the caller's transaction.
+    """
+    # DROP TABLE discards the AUTOINCREMENT counter, so remember it
+    cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = 'invoice_items'")
+    sequence = cursor.fetchone()
+
+    cursor.execute(f"""
+        CREATE TABLE invoice_items_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            invoice_id INTEGER NOT NULL,
+            product_id INTEGER NOT NULL,
+            quantity INTEGER NOT NULL,
+            unit_price REAL NOT NULL,
+            line_total REAL NOT NULL,
+            FOREIGN KEY (invoice_id) REFERENCES invoices (id) {on_delete},
+            FOREIGN KEY (product_id) REFERENCES products (id)
+        )
+    """)
+    cursor.execute("""
+        INSERT INTO invoice_items_new (id, invoice_id, product_id, quantity, unit_price, line_total)
+        SELECT id, invoice_id, product_id, quantity, unit_price, line_total FROM invoice_items
+    """)
+    cursor.execute("DROP TABLE invoice_items")
+    cursor.execute("ALTER TABLE invoice_items_new RENAME TO invoice_items")
+
+    # Restore the counter so IDs of deleted items are never reused
+    cursor.execute("DELETE FROM sqlite_sequence WHERE name IN ('invoice_items', 'invoice_items_new')")
+    if sequence is not None:
+        cursor.execute("INSERT INTO sqlite_sequence (name, seq) VALUES ('invoice_items', ?)", (sequence[0],))
+
+    cursor.execute("PRAGMA foreign_key_check(invoice_items)")
+    if cursor.fetchall():
+        raise sqlite3.IntegrityError("invoice_items has rows violating its foreign keys")
+
+
+def upgrade():
+    """Apply the migration."""
+    # Manage the transaction explicitly so the table rebuild is all-or-nothing
+    conn = sqlite3.connect(DATABASE_PATH, isolation_level=None)
+    cursor = conn.cursor()
+    
+    # Check if this migration has already been applied
+    cursor.execute("SELECT 1 FROM _migrations WHERE name = ?", ("003_optimize_invoicing_schema",))
+    if cursor.fetchone():
+        print("Migration 003_optimize_invoicing_schema already applied. Skipping.")
+        conn.close()
+        return
+
+    cursor.execute("BEGIN")
+    try:
+        _upgrade(cursor)
+        cursor.execute("COMMIT")
+    except Exception:
+        cursor.execute("ROLLBACK")
+        conn.close()
+        raise
+
+    conn.close()
+    print("Migration 003_optimize_invoicing_schema applied successfully.")
+
+
+def _upgrade(cursor):
+    """Apply the schema changes within an open transaction."""
+    # Delete invoice items together with their invoice
+    rebuild_invoice_items(cursor, "ON DELETE CASCADE")
+
+    # Index foreign keys used by invoice lookups and joins
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_invoice_items_invoice_id ON invoice_items (invoice_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_invoices_client_id ON invoices (client_id)")
+
+    # Create views for the invoice list and detail queries
+    cursor.execute("""
+        CREATE VIEW IF NOT EXISTS v_invoice_list AS
+        SELECT i.id, i.invoice_no, i.issue_date, i.due_date, i.total_amount, c.name AS client_name
+        FROM invoices i
+        JOIN clients c ON i.client_id = c.id
+    """)
+
+    cursor.execute("""
+        CREATE VIEW IF NOT EXISTS v_invoice_detail AS
+        SELECT i.id, i.invoice_no, i.issue_date, i.due_date, i.tax_amount, i.total_amount, c.name AS client_name,
+               ii.id AS item_id, p.name AS product_name, ii.quantity, ii.unit_price, ii.line_total
+        FROM invoices i
+        JOIN clients c ON i.client_id = c.id
+        LEFT JOIN invoice_items ii ON ii.invoice_id = i.id
+        LEFT JOIN products p ON ii.product_id = p.id
+    """)
+
+    # Record this migration
+    cursor.execute("INSERT INTO _migrations (name) VALUES (?)", ("003_optimize_invoicing_schema",))
+
+
+def downgrade():
+    """Revert the migration."""
+    # Manage the transaction explicitly so the table rebuild is all-or-nothing
+    conn = sqlite3.connect(DATABASE_PATH, isolation_level=None)
+    cursor = conn.cursor()
+
+    cursor.execute("BEGIN")
+    try:
+        _downgrade(cursor)
+        cursor.execute("COMMIT")
+    except Exception:
+        cursor.execute("ROLLBACK")
+        conn.close()
+        raise
+
+    conn.close()
+    print("Migration 003_optimize_invoicing_schema reverted successfully.")
+
+
+def _downgrade(cursor):
+    """Revert the schema changes within an open transaction."""
+    # Drop views
+    cursor.execute("DROP VIEW IF EXISTS v_invoice_detail")
+    cursor.execute("DROP VIEW IF EXISTS v_invoice_list")
+
+    # Drop indexes
+    cursor.execute("DROP INDEX IF EXISTS idx_invoice_items_invoice_id")
+    cursor.execute("DROP INDEX IF EXISTS idx_invoices_client_id")
+
+    # Restore the non-cascading invoice FK
+    rebuild_invoice_items(cursor, "")
+    
+    # Remove migration record
+    cursor.execute("DELETE FROM _migrations WHERE name = ?", ("003_optimize_invoicing_schema",))
+
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Run database migration")
+    parser.add_argument(
+        "action",
+        choices=["upgrade", "downgrade"],
+        help="Migration action to perform"
+    )
+    
+    args = parser.parse_args()
+    
+    if args.action == "upgrade":
+        upgrade()
+    elif args.action == "downgrade":
+        downgrade()
@@ -8,14 +8,17 @@ def log(msg):
     print(f"[TEST] {msg}")
 
 def test_invoices():
+    # Reuse one keep-alive connection for every request
+    s = requests.Session()
+
     # Wait for service to be up
     log("Waiting for service to be ready...")
     for _ in range(10):
         try:
-            resp = requests.get(f"{BASE_URL}/docs")
+            resp = s.get(f"{BASE_URL}/docs", timeout=0.5)
             if resp.status_code == 200:
                 break
-        except requests.exceptions.ConnectionError:
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
             time.sleep(1)
     else:
         log("Service not reachable. Exiting.")
@@ -23,7 +26,7 @@ def test_invoices():
 
     # 1. List Invoices (Should be empty initially)
     log("1. Listing Invoices...")
-    resp = requests.get(f"{BASE_URL}/invoices")
+    resp = s.get(f"{BASE_URL}/invoices")
     print(f"Status: {resp.status_code}, Body: {resp.json()}")
     assert resp.status_code == 200
     assert isinstance(resp.json(), list)
@@ -41,37 +44,72 @@ def test_invoices():
         ]
     }
     # Total should be 70.0 + 10% tax = 77.0
-    resp = requests.post(f"{BASE_URL}/invoices", json=payload)
+    resp = s.post(f"{BASE_URL}/invoices", json=payload)
     print(f"Status: {resp.status_code}, Body: {resp.json()}")
     assert resp.status_code == 201
-    invoice_id = resp.json()["id"]
-    assert resp.json()["total_amount"] == 77.0
+    created = resp.json()
+    invoice_id = created["id"]
+    assert created["tax_amount"] == 7.0
+    assert created["total_amount"] == 77.0
+    # Item IDs are the real database IDs, not placeholders
+    item_ids = [item["id"] for item in created["items"]]
+    assert all(item_id > 0 for item_id in item_ids)
+    assert len(set(item_ids)) == len(item_ids)
 
     # 3. Get Invoice
     log(f"3. Getting Invoice {invoice_id}...")
-    resp = requests.get(f"{BASE_URL}/invoices/{invoice_id}")
+    resp = s.get(f"{BASE_URL}/invoices/{invoice_id}")
     print(f"Status: {resp.status_code}, Body: {resp.json()}")
     assert resp.status_code == 200
     assert resp.json()["invoice_no"] == "INV-001"
     assert len(resp.json()["items"]) == 2
+    # The stored invoice matches what create returned, field for field
+    assert resp.json() == created
 
     # 4. List Invoices again
     log("4. Listing Invoices again...")
-    resp = requests.get(f"{BASE_URL}/invoices")
+    resp = s.get(f"{BASE_URL}/invoices")
     print(f"Status: {resp.status_code}, Body: {resp.json()}")
     assert len(resp.json()) >= 1
+    # The list fetched in step 1 must not be served stale after a create
+    listed = {invoice["id"]: invoice for invoice in resp.json()}
+    assert invoice_id in listed
+    expected = {key: created[key] for key in ("id", "invoice_no", "issue_date", "due_date", "client_name", "total_amount")}
+    assert listed[invoice_id] == expected
+
+    # 4b. Tax is rounded half up to the nearest cent
+    log("4b. Creating Invoice with a half-cent tax...")
+    rounding_payload = {
+        "client_id": 2,  # Globex Inc
+        "invoice_no": "INV-002",
+        "issue_date": "2023-10-27",
+        "due_date": "2023-11-27",
+        "items": [
+            {"product_id": 4, "quantity": 5}  # 5 * Gadget Y (99.99) = 499.95
+        ]
+    }
+    # 10% tax on 499.95 is 49.995, which rounds to 50.00
+    resp = s.post(f"{BASE_URL}/invoices", json=rounding_payload)
+    print(f"Status: {resp.status_code}, Body: {resp.json()}")
+    assert resp.status_code == 201
+    assert resp.json()["items"][0]["line_total"] == 499.95
+    assert resp.json()["tax_amount"] == 50.0
+    assert resp.json()["total_amount"] == 549.95
+    assert s.delete(f"{BASE_URL}/invoices/{resp.json()['id']}").status_code == 204
 
     # 5. Delete Invoice
     log(f"5. Deleting Invoice {invoice_id}...")
-    resp = requests.delete(f"{BASE_URL}/invoices/{invoice_id}")
+    resp = s.delete(f"{BASE_URL}/invoices/{invoice_id}")
     print(f"Status: {resp.status_code}")
     assert resp.status_code == 204
 
     # 6. Verify Deletion
     log("6. Verifying Deletion...")
-    resp = requests.get(f"{BASE_URL}/invoices/{invoice_id}")
+    resp = s.get(f"{BASE_URL}/invoices/{invoice_id}")
     print(f"Status: {resp.status_code}")
     assert resp.status_code == 404
+    resp = s.get(f"{BASE_URL}/invoices")
+    assert invoice_id not in [invoice["id"] for invoice in resp.json()]
 
     log("ALL TESTS PASSED!")
 